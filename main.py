@@ -1,13 +1,31 @@
 import asyncio
 import websockets
+import aiohttp
 import json
-import edge_tts
+import orjson
+import msgspec
 import pygame
 import random
 import os
 import re
 import logging
-import datetime
+import collections
+import functools
+import itertools
+import io
+import ssl
+import time
+import uuid
+from xml.sax.saxutils import escape
+import certifi
+from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+from edge_tts.drm import DRM
+
+# uvloop is not available on Windows; fall back to the stock event loop there
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,18 +41,159 @@ pygame.mixer.init()
 os.makedirs(config["output_directory"], exist_ok=True)
 
 
-def replace_strings(text, replacements):
+def trie_pattern(words):
     """
-    Replace substrings in the text based on a dictionary of replacements.
+    Build a regex that matches any of the words, with shared prefixes factored into a trie.
+
+    Each prefix is only tried once per position, and longer words are preferred
+    over words that are a prefix of them (e.g. "o'er" before "o'").
+
+    :param words: The words to match.
+    :return: A regex pattern string.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def to_pattern(node):
+        branches = [re.escape(char) + to_pattern(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # Optional suffixes are greedy, so the longest word is tried first
+        return f"(?:{pattern})?" if "" in node else pattern
+
+    return to_pattern(trie)
+
+
+# The replacements never change at runtime, so the pattern is built only once
+_REPLACEMENTS = config["string_replacements"]
+_REPLACE_RE = re.compile(r"\b(" + trie_pattern(_REPLACEMENTS) + r")\b")
+
+
+def replace_strings(text):
+    """
+    Replace substrings in the text based on the configured string replacements.
 
     :param text: The input text.
-    :param replacements: A dictionary where keys are substrings to be replaced and values are the replacements.
     :return: The text with replacements applied.
     """
-    pattern = re.compile(
-        r"\b(" + "|".join(re.escape(key) for key in replacements.keys()) + r")\b"
-    )
-    return pattern.sub(lambda x: replacements[x.group()], text)
+    return _REPLACE_RE.sub(lambda x: _REPLACEMENTS[x.group()], text)
+
+
+# In-memory view of the speaker file, keyed by (name, race)
+_speaker_data = []
+_speaker_index = {}
+# (name, gender, race) of every known speaker, for duplicate checks
+_speaker_keys = set()
+_speaker_mtime = None
+# Speakers added since the speaker file was last written
+_pending_speakers = []
+
+# New speakers are written to disk in batches, this many seconds after the first one
+SPEAKER_FLUSH_DELAY = 2
+_speaker_flush_task = None
+_speaker_flush_now = asyncio.Event()
+
+# Strong references to fire-and-forget tasks so they are not garbage collected
+_background_tasks = set()
+
+
+def load_speaker_data(speaker_file_path):
+    """
+    Read the list of known speakers from the JSON speaker file.
+
+    :param speaker_file_path: Path to the JSON file where speaker details are stored.
+    :return: A list of speaker dictionaries, empty if the file is missing or invalid.
+    """
+    try:
+        with open(speaker_file_path, "rb") as file:
+            return orjson.loads(file.read())
+    except (FileNotFoundError, orjson.JSONDecodeError):
+        return []
+
+
+def write_speaker_data(speaker_data, speaker_file_path):
+    """
+    Atomically write the list of known speakers to the JSON speaker file.
+
+    This is blocking and is meant to be run in a worker thread.
+
+    :param speaker_data: A list of speaker dictionaries.
+    :param speaker_file_path: Path to the JSON file where speaker details are stored.
+    :return: The modification time of the written file.
+    """
+    temp_path = f"{speaker_file_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(orjson.dumps(speaker_data, option=orjson.OPT_INDENT_2))
+    os.replace(temp_path, speaker_file_path)
+    return os.stat(speaker_file_path).st_mtime
+
+
+def speaker_file_mtime(speaker_file_path):
+    """
+    Get the modification time of the speaker file.
+
+    :param speaker_file_path: Path to the JSON file where speaker details are stored.
+    :return: The modification time, or None if the file does not exist.
+    """
+    try:
+        return os.stat(speaker_file_path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def set_speaker_data(speaker_data, mtime):
+    """
+    Replace the in-memory speakers and rebuild the lookup structures.
+
+    :param speaker_data: A list of speaker dictionaries.
+    :param mtime: The modification time of the speaker file the list matches.
+    """
+    global _speaker_data, _speaker_mtime
+    _speaker_data = speaker_data
+    _speaker_index.clear()
+    _speaker_keys.clear()
+    for s in _speaker_data:
+        _speaker_index[(s["name"], s["race"])] = s
+        _speaker_keys.add((s["name"], s["gender"], s["race"]))
+    _speaker_mtime = mtime
+
+
+def get_speaker(speaker_name, race):
+    """
+    Look up a known speaker, reloading the speaker file only if it changed on disk.
+
+    :param speaker_name: The name of the speaker.
+    :param race: The race of the speaker.
+    :return: The stored speaker dictionary, or None if the speaker is unknown.
+    """
+    speaker_file_path = config["speaker_file_path"]
+    mtime = speaker_file_mtime(speaker_file_path)
+    # Pending speakers are merged into external edits by flush_speaker_data instead
+    if mtime != _speaker_mtime and _speaker_flush_task is None:
+        set_speaker_data(load_speaker_data(speaker_file_path), mtime)
+    return _speaker_index.get((speaker_name, race))
+
+
+def run_in_background(coro):
+    """
+    Schedule a coroutine as a task without awaiting it.
+
+    :param coro: The coroutine to run.
+    :return: The created task.
+    """
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+# Voice lists per gender, built once from the config
+_VOICES_BY_GENDER = {gender: tuple(voices) for gender, voices in config["voices"].items()}
 
 
 def get_random_voice(gender, last_voice=None):
@@ -45,10 +204,20 @@ def get_random_voice(gender, last_voice=None):
     :param last_voice: The last used voice to avoid repetition.
     :return: A randomly selected voice.
     """
-    available_voices = config["voices"].get(gender.lower(), config["voices"]["male"])
-    if last_voice:
-        available_voices = [voice for voice in available_voices if voice != last_voice]
-    return random.choice(available_voices)
+    available_voices = _VOICES_BY_GENDER.get(gender.lower(), _VOICES_BY_GENDER["male"])
+    voice = random.choice(available_voices)
+    # Redraw on a repeat instead of building a filtered copy of the list
+    while voice == last_voice and len(available_voices) > 1:
+        voice = random.choice(available_voices)
+    return voice
+
+
+# Pitch ranges in Hz per race; other races use DEFAULT_PITCH_RANGE
+_PITCH_RANGES = {
+    "Lalafell": (10, 20),
+    "Roegadyn": (-20, -10),
+}
+DEFAULT_PITCH_RANGE = (-10, 10)
 
 
 def get_random_pitch(race):
@@ -58,76 +227,485 @@ def get_random_pitch(race):
     :param race: The race of the speaker (e.g., 'Lalafell', 'Roegadyn').
     :return: A pitch value as a string.
     """
-    if race == "Lalafell":
-        pitch = random.randint(10, 20)
-    elif race == "Roegadyn":
-        pitch = random.randint(-20, -10)
-    else:
-        pitch = random.randint(-10, 10)
-    return f"{pitch:+}"
+    low, high = _PITCH_RANGES.get(race, DEFAULT_PITCH_RANGE)
+    return "%+d" % random.randint(low, high)
 
 
-def cleanup_old_files(directory, max_files):
+def list_output_files(directory):
     """
-    Remove the oldest files in the directory if the number of files exceeds the max_files limit.
+    List the files in the output directory, oldest first.
 
     :param directory: Directory to check for files.
+    :return: A list of file paths sorted by modification time.
+    """
+    with os.scandir(directory) as it:
+        entries = [(entry.stat().st_mtime, entry.path) for entry in it if entry.is_file()]
+    entries.sort()
+    return [path for _, path in entries]
+
+
+# Saved output files, oldest first, so cleanup never has to rescan the directory
+_output_files = collections.deque(list_output_files(config["output_directory"]))
+# Output file numbers; seeded from the clock so names stay unique across restarts
+_output_seq = itertools.count(time.time_ns() // 1_000_000)
+
+
+def track_output_file(filename, max_files):
+    """
+    Record a newly saved output file and remove the oldest ones beyond the max_files limit.
+
+    :param filename: Path of the file that was just written.
     :param max_files: Maximum number of files to retain.
     """
-    files = [os.path.join(directory, f) for f in os.listdir(directory) if os.path.isfile(os.path.join(directory, f))]
-    if len(files) > max_files:
-        files.sort(key=os.path.getmtime)
-        old_files = files[:-max_files]  
-        for file in old_files:
-            os.remove(file)
-            logging.info(f"Removed old file: {file}")
+    _output_files.append(filename)
+    while len(_output_files) > max_files:
+        old_file = _output_files.popleft()
+        try:
+            os.remove(old_file)
+        except FileNotFoundError:
+            continue
+        logging.info(f"Removed old file: {old_file}")
+
 
+# Pooled connections to the edge-tts service are closed after this many idle seconds
+TTS_WS_IDLE_TTL = 15
+TTS_RECEIVE_TIMEOUT = 60
+# The service rejects requests whose escaped text is longer than this many bytes
+TTS_MAX_TEXT_BYTES = 4096
 
-async def speak_text(text, voice, pitch):
+# Characters the TTS service rejects, mapped to spaces
+_TTS_INCOMPATIBLE_CHARS = dict.fromkeys([*range(0, 9), 11, 12, *range(14, 32)], " ")
+
+# Use certifi's CA bundle like edge_tts does, for Python builds without system certificates
+_TTS_SSL_CONTEXT = ssl.create_default_context(cafile=certifi.where())
+
+_tts_session = None
+# Warm WebSocket connections to the edge-tts service, as (websocket, idle_since) pairs
+_tts_ws_pool = []
+
+
+def edge_voice_name(voice):
+    """
+    Convert a short voice name (e.g. 'en-US-GuyNeural') to the full name Microsoft Edge sends.
+
+    :param voice: The TTS voice name.
+    :return: The full voice name.
+    """
+    match = re.match(r"^([a-z]{2,})-([A-Z]{2,})-(.+Neural)$", voice)
+    if match is None:
+        return voice
+    lang, region, name = match.groups()
+    if "-" in name:
+        variant, name = name.split("-", 1)
+        region = f"{region}-{variant}"
+    return f"Microsoft Server Speech Text to Speech Voice ({lang}-{region}, {name})"
+
+
+async def open_tts_websocket():
+    """
+    Open a new WebSocket connection to the edge-tts service.
+
+    :return: The connected aiohttp WebSocket.
+    """
+    global _tts_session
+    if _tts_session is None or _tts_session.closed:
+        _tts_session = aiohttp.ClientSession(
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10),
+        )
+    headers = DRM.headers_with_muid(WSS_HEADERS)
+    for attempt in range(2):
+        try:
+            return await _tts_session.ws_connect(
+                f"{WSS_URL}&ConnectionId={uuid.uuid4().hex}"
+                f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+                f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}",
+                compress=15,
+                headers=headers,
+                ssl=_TTS_SSL_CONTEXT,
+            )
+        except aiohttp.ClientResponseError as e:
+            # A 403 means the local clock is skewed; correct it and retry once
+            if e.status != 403 or attempt:
+                raise
+            DRM.handle_client_response_error(e)
+
+
+async def acquire_tts_websocket():
+    """
+    Take a warm connection from the pool, or open a new one if none is usable.
+
+    :return: A connected aiohttp WebSocket.
+    """
+    while _tts_ws_pool:
+        websocket, idle_since = _tts_ws_pool.pop()
+        if not websocket.closed and time.monotonic() - idle_since < TTS_WS_IDLE_TTL:
+            return websocket
+        await websocket.close()
+    return await open_tts_websocket()
+
+
+def release_tts_websocket(websocket):
+    """
+    Return a connection to the pool so the next utterance can reuse it.
+
+    :param websocket: The aiohttp WebSocket to return.
+    """
+    if not websocket.closed:
+        _tts_ws_pool.append((websocket, time.monotonic()))
+
+
+async def tts_pool_reaper():
+    """
+    Periodically close pooled connections that have been idle for longer than TTS_WS_IDLE_TTL.
+    """
+    while True:
+        await asyncio.sleep(TTS_WS_IDLE_TTL / 3)
+        now = time.monotonic()
+        for entry in list(_tts_ws_pool):
+            if now - entry[1] >= TTS_WS_IDLE_TTL:
+                _tts_ws_pool.remove(entry)
+                await entry[0].close()
+
+
+async def close_tts_pool():
+    """
+    Close all pooled connections and the underlying HTTP session.
+    """
+    while _tts_ws_pool:
+        websocket, _ = _tts_ws_pool.pop()
+        await websocket.close()
+    if _tts_session is not None:
+        await _tts_session.close()
+
+
+# Body of the speech.config message, identical for every request
+_SPEECH_CONFIG = (
+    "Content-Type:application/json; charset=utf-8\r\n"
+    "Path:speech.config\r\n\r\n"
+    '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+    '"sentenceBoundaryEnabled":"false","wordBoundaryEnabled":"false"},'
+    '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"}}}}\r\n'
+)
+_SSML_SUFFIX = "</prosody></voice></speak>"
+
+
+@functools.lru_cache(maxsize=128)
+def ssml_prefix(voice, pitch, rate):
+    """
+    Build the SSML that goes before the text for a voice, pitch and rate combination.
+
+    Speakers keep the same voice and pitch, so this is cached.
+
+    :param voice: The TTS voice to use.
+    :param pitch: The pitch adjustment, e.g. '+5Hz'.
+    :param rate: The speaking rate adjustment, e.g. '+25%'.
+    :return: The opening SSML tags; close them with _SSML_SUFFIX.
+    """
+    return (
+        "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+        f"<voice name='{edge_voice_name(voice)}'>"
+        f"<prosody pitch='{pitch}' rate='{rate}' volume='+0%'>"
+    )
+
+
+async def request_speech(websocket, ssml, audio):
+    """
+    Send one synthesis request over an open connection and collect the audio.
+
+    :param websocket: A connected aiohttp WebSocket.
+    :param ssml: The SSML document to synthesise.
+    :param audio: A file-like object the MP3 audio is appended to.
+    """
+    timestamp = time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+    await websocket.send_str(f"X-Timestamp:{timestamp}\r\n{_SPEECH_CONFIG}")
+    await websocket.send_str(
+        f"X-RequestId:{uuid.uuid4().hex}\r\n"
+        "Content-Type:application/ssml+xml\r\n"
+        f"X-Timestamp:{timestamp}Z\r\n"
+        "Path:ssml\r\n\r\n"
+        f"{ssml}"
+    )
+    while True:
+        message = await websocket.receive(timeout=TTS_RECEIVE_TIMEOUT)
+        if message.type == aiohttp.WSMsgType.BINARY:
+            # Binary frames are a 2-byte header length, the headers, then the audio
+            header_length = int.from_bytes(message.data[:2], "big")
+            audio.write(message.data[header_length + 2:])
+        elif message.type == aiohttp.WSMsgType.TEXT:
+            if "Path:turn.end" in message.data:
+                return
+        else:
+            raise ConnectionError(f"TTS connection closed unexpectedly ({message.type.name})")
+
+
+def split_tts_text(escaped_text, max_bytes=TTS_MAX_TEXT_BYTES):
+    """
+    Split escaped text on spaces into chunks the TTS service accepts.
+
+    Splitting on spaces never cuts through an XML entity or a multi-byte character.
+
+    :param escaped_text: The XML-escaped text.
+    :param max_bytes: Maximum UTF-8 length of a chunk.
+    :return: A list of text chunks.
+    :raises ValueError: If a single word is longer than max_bytes.
+    """
+    if len(escaped_text.encode("utf-8")) <= max_bytes:
+        return [escaped_text]
+    chunks = []
+    current = ""
+    for word in escaped_text.split(" "):
+        candidate = f"{current} {word}" if current else word
+        if len(candidate.encode("utf-8")) <= max_bytes:
+            current = candidate
+            continue
+        if len(word.encode("utf-8")) > max_bytes:
+            raise ValueError(f"Text contains a word longer than {max_bytes} bytes")
+        chunks.append(current)
+        current = word
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def synthesize(text, voice, pitch, rate):
+    """
+    Synthesise speech over a pooled connection to the edge-tts service.
+
+    Text longer than TTS_MAX_TEXT_BYTES is sent as several requests whose audio is joined.
+
+    :param text: The text to be spoken.
+    :param voice: The TTS voice to use.
+    :param pitch: The pitch adjustment, e.g. '+5Hz'.
+    :param rate: The speaking rate adjustment, e.g. '+25%'.
+    :return: The MP3 audio as an in-memory file.
+    """
+    prefix = ssml_prefix(voice, pitch, rate)
+    audio = io.BytesIO()
+    for chunk in split_tts_text(escape(text.translate(_TTS_INCOMPATIBLE_CHARS))):
+        ssml = prefix + chunk + _SSML_SUFFIX
+        start = audio.tell()
+        for attempt in range(2):
+            websocket = await acquire_tts_websocket()
+            try:
+                await request_speech(websocket, ssml, audio)
+            except (aiohttp.ClientError, ConnectionError, asyncio.TimeoutError):
+                # The server may have dropped or stalled a pooled connection; retry once on a fresh one
+                if attempt:
+                    raise
+                audio.seek(start)
+                audio.truncate()
+            else:
+                release_tts_websocket(websocket)
+                websocket = None
+                break
+            finally:
+                # Close the connection on any failure, including cancellation
+                if websocket is not None:
+                    await websocket.close()
+    audio.seek(0)
+    return audio
+
+
+async def speak_text(text, voice, pitch, generation):
     """
     Generate speech from text using the specified voice and pitch, and play it.
 
+    The audio is played straight from memory; it is only written to the output
+    directory when "save_output_files" is enabled in the config.
+
     :param text: The text to be spoken.
     :param voice: The TTS voice to use.
     :param pitch: The pitch adjustment for the voice.
+    :param generation: The cancel generation the utterance was queued in.
     """
-    now = datetime.datetime.now()
-    timestamp = now.strftime("%Y%d%m%H%M%S") + f"{int(now.microsecond/10000):02d}"
-    filename = os.path.join(config["output_directory"], f"{timestamp}.mp3")
     rate = "+25%"
-    communicate = edge_tts.Communicate(text, voice=voice, pitch=f"{pitch}Hz", rate=rate)
-    await communicate.save(filename)
-    pygame.mixer.music.load(filename)
+    audio = await synthesize(text, voice, f"{pitch}Hz", rate)
+    # A Cancel arrived while this utterance was being synthesised
+    if generation != _tts_generation:
+        return
+    pygame.mixer.music.load(audio, "mp3")
     pygame.mixer.music.play()
 
-  
-    cleanup_old_files(config["output_directory"], config["max_output_files"])
+    if config.get("save_output_files", False):
+        filename = os.path.join(config["output_directory"], f"{next(_output_seq)}.mp3")
+        with open(filename, "wb") as file:
+            file.write(audio.getbuffer())
+        track_output_file(filename, config["max_output_files"])
+
+
+# Utterances waiting to be synthesised, as (text, voice, pitch, generation) tuples
+tts_queue = asyncio.Queue(maxsize=32)
+# Bumped on every Cancel so utterances queued or in flight before it are not played
+_tts_generation = 0
 
 
-async def handle_speaker_info(speaker_info, speaker_file_path):
+async def tts_worker():
+    """
+    Speak queued utterances one at a time, keeping TTS latency out of the recv loop.
+    """
+    while True:
+        text, voice, pitch, generation = await tts_queue.get()
+        try:
+            await speak_text(text, voice, pitch, generation)
+        except Exception as e:
+            logging.error(f"Failed to speak text: {e}")
+        finally:
+            tts_queue.task_done()
+
+
+def clear_tts_queue():
+    """
+    Drop all utterances that have not been synthesised yet.
+    """
+    while not tts_queue.empty():
+        tts_queue.get_nowait()
+        tts_queue.task_done()
+
+
+def cancel_speech():
+    """
+    Stop the current utterance and drop everything queued or still being synthesised.
+    """
+    global _tts_generation
+    _tts_generation += 1
+    clear_tts_queue()
+    pygame.mixer.music.stop()
+
+
+def handle_speaker_info(speaker_info, speaker_file_path):
     """
     Handle the persistence of speaker information in a JSON file.
 
+    New speakers are batched and written by flush_speaker_data shortly afterwards.
+
     :param speaker_info: A dictionary containing speaker information (name, gender, voice, pitch, race).
     :param speaker_file_path: Path to the JSON file where speaker details are stored.
     """
+    global _speaker_flush_task
+    key = (speaker_info["name"], speaker_info["gender"], speaker_info["race"])
+    if key in _speaker_keys:
+        return
+    _speaker_keys.add(key)
+    _speaker_data.append(speaker_info)
+    _pending_speakers.append(speaker_info)
+    if _speaker_flush_task is None:
+        _speaker_flush_task = run_in_background(flush_speaker_data(speaker_file_path))
+    logging.info(f"Speaker created: {speaker_info['name']} with gender {speaker_info['gender']} and race {speaker_info['race']}")
+
+
+async def flush_speaker_data(speaker_file_path):
+    """
+    Write all speakers to the JSON file once, after waiting for more new speakers to arrive.
+
+    :param speaker_file_path: Path to the JSON file where speaker details are stored.
+    """
+    global _speaker_flush_task, _speaker_mtime
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(_speaker_flush_now.wait(), SPEAKER_FLUSH_DELAY)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                if speaker_file_mtime(speaker_file_path) != _speaker_mtime:
+                    # The file was edited since we read it; keep the edit and add the pending speakers to it
+                    speaker_data = await asyncio.to_thread(load_speaker_data, speaker_file_path)
+                    known = {(s["name"], s["gender"], s["race"]) for s in speaker_data}
+                    speaker_data.extend(
+                        s for s in _pending_speakers if (s["name"], s["gender"], s["race"]) not in known
+                    )
+                    set_speaker_data(speaker_data, speaker_file_mtime(speaker_file_path))
+                count = len(_pending_speakers)
+                _speaker_mtime = await asyncio.to_thread(write_speaker_data, list(_speaker_data), speaker_file_path)
+            except OSError as e:
+                # Keep the speakers pending and try again after the next delay, or give up on shutdown
+                if _speaker_flush_now.is_set():
+                    logging.error(f"Failed to write speaker file: {e}. New speakers were not saved.")
+                    break
+                logging.error(f"Failed to write speaker file: {e}. Retrying in {SPEAKER_FLUSH_DELAY} seconds...")
+                continue
+            del _pending_speakers[:count]
+            # Go around again if more speakers arrived during the write
+            if not _pending_speakers:
+                break
+    finally:
+        _speaker_flush_task = None
+
+
+async def save_pending_speakers():
+    """
+    Write any batched speakers immediately instead of waiting for the flush delay.
+    """
+    if _speaker_flush_task is not None:
+        _speaker_flush_now.set()
+        await _speaker_flush_task
+
+
+class SayVoice(msgspec.Struct):
+    Name: str | None = "Male"
+
+
+class Say(msgspec.Struct, tag="Say", tag_field="Type"):
+    Speaker: str | None = ""
+    Voice: SayVoice | None = None
+    Race: str | None = "Unknown"
+    Payload: str | None = ""
+
+
+class Cancel(msgspec.Struct, tag="Cancel", tag_field="Type"):
+    pass
+
+
+class MessageType(msgspec.Struct):
+    Type: str | None = None
+
+
+# Decodes TextToTalk messages straight into Say/Cancel structs, ignoring unused fields
+_message_decoder = msgspec.json.Decoder(Say | Cancel)
+# Only used to tell unsupported message types apart from malformed Say/Cancel messages
+_message_type_decoder = msgspec.json.Decoder(MessageType)
+
+def decode_message(message):
+    """
+    Decode a raw TextToTalk frame.
+
+    :param message: The frame as bytes.
+    :return: A Say or Cancel struct, or None if the frame is ignored.
+    """
+    try:
+        return _message_decoder.decode(message)
+    except msgspec.ValidationError as e:
+        try:
+            message_type = _message_type_decoder.decode(message).Type
+        except msgspec.DecodeError:
+            message_type = None
+        if message_type in ("Say", "Cancel"):
+            logging.warning(f"Dropping invalid {message_type} message: {e}")
+        else:
+            logging.debug(f"Ignoring message of type {message_type}")
+    except msgspec.DecodeError as e:
+        logging.warning(f"Dropping malformed message: {e}")
+    return None
+
+
+def queue_speech(item):
+    """
+    Put an utterance on the TTS queue without waiting, dropping the oldest one if it is full.
+
+    Waiting for room would stop the listener from reading, so a Cancel behind the backlog
+    would not be seen until the queue drained. Queued lines cut each other off on playback
+    anyway, so the oldest one is the least useful.
+
+    :param item: The (text, voice, pitch, generation) tuple to queue.
+    """
     try:
-        with open(speaker_file_path, "r") as file:
-            speaker_data = json.load(file)
-    except (FileNotFoundError, json.JSONDecodeError):
-        speaker_data = []
-
-  
-    if not any(
-        s["name"] == speaker_info["name"]
-        and s["gender"] == speaker_info["gender"]
-        and s["race"] == speaker_info["race"]
-        for s in speaker_data
-    ):
-        speaker_data.append(speaker_info)
-        with open(speaker_file_path, "w") as file:
-            json.dump(speaker_data, file, indent=4)
-        logging.info(f"Speaker created: {speaker_info['name']} with gender {speaker_info['gender']} and race {speaker_info['race']}")
+        tts_queue.put_nowait(item)
+    except asyncio.QueueFull:
+        tts_queue.get_nowait()
+        tts_queue.task_done()
+        logging.warning("TTS queue is full, dropping the oldest line.")
+        tts_queue.put_nowait(item)
 
 
 async def listen():
@@ -140,58 +718,55 @@ async def listen():
     last_voice = None
     while True:
         try:
-            async with websockets.connect(uri) as websocket:
+            # Frames are small JSON documents; compression and text decoding only cost CPU
+            async with websockets.connect(uri, compression=None, max_size=2**20, max_queue=16) as websocket:
                 logging.info("Connected to the WebSocket server.")
                 while True:
                     try:
-                        message = await websocket.recv()
+                        message = await websocket.recv(decode=False)
                     except asyncio.CancelledError:
                         logging.info("Task cancelled.")
                         return
-
-                    data = json.loads(message)
-
-                    if data.get("Type") == "Say":
-                        speaker_name = data.get("Speaker", "")
-                        gender = data.get("Voice", {}).get("Name", "Male")
-                        race = data.get("Race", "Unknown")
-
-                        speaker_file_path = config["speaker_file_path"]
-                        try:
-                            with open(speaker_file_path, "r") as file:
-                                speaker_data = json.load(file)
-                        except (FileNotFoundError, json.JSONDecodeError):
-                            speaker_data = []
-
-                      
-                        speaker = next(
-                            (s for s in speaker_data if s["name"] == speaker_name and s["race"] == race),
-                            None,
-                        )
-
-                        if speaker:
-                            voice = speaker["voice"]
-                            pitch = speaker["pitch"]
-                        else:
-                            voice = get_random_voice(gender, last_voice)
-                            last_voice = voice
-                            pitch = get_random_pitch(race)
-                            speaker_info = {
-                                "name": speaker_name,
-                                "gender": gender,
-                                "race": race,
-                                "voice": voice,
-                                "pitch": pitch,
-                            }
-                            await handle_speaker_info(speaker_info, speaker_file_path)
-
-                        payload = data.get("Payload", "").lower()
-                        payload = replace_strings(payload, config["string_replacements"])
-                        if payload:
-                            await speak_text(payload, voice, pitch)
-
-                    elif data.get("Type") == "Cancel":
-                        pygame.mixer.music.stop()
+                    msg = decode_message(message)
+
+                    match msg:
+                        case Say():
+                            payload = msg.Payload
+                            # Skip blank lines before doing any text processing or speaker lookup
+                            if not payload or payload.isspace():
+                                continue
+                            if not payload.islower():
+                                payload = payload.lower()
+                            payload = replace_strings(payload)
+
+                            speaker_name = msg.Speaker if msg.Speaker is not None else ""
+                            gender = msg.Voice.Name if msg.Voice is not None and msg.Voice.Name is not None else "Male"
+                            race = msg.Race if msg.Race is not None else "Unknown"
+
+                            speaker = get_speaker(speaker_name, race)
+
+                            if speaker:
+                                voice = speaker["voice"]
+                                pitch = speaker["pitch"]
+                            else:
+                                voice = get_random_voice(gender, last_voice)
+                                last_voice = voice
+                                pitch = get_random_pitch(race)
+                                speaker_info = {
+                                    "name": speaker_name,
+                                    "gender": gender,
+                                    "race": race,
+                                    "voice": voice,
+                                    "pitch": pitch,
+                                }
+                                _speaker_index[(speaker_name, race)] = speaker_info
+                                handle_speaker_info(speaker_info, config["speaker_file_path"])
+
+                            if payload:
+                                queue_speech((payload, voice, pitch, _tts_generation))
+
+                        case Cancel():
+                            cancel_speech()
         except websockets.ConnectionClosed:
             logging.warning("Connection closed. Attempting to reconnect...")
             await asyncio.sleep(5)
@@ -209,18 +784,25 @@ async def listen():
 
 async def main():
     """
-    Main entry point for the script. Starts the WebSocket listener.
+    Main entry point for the script. Starts the TTS worker and the WebSocket listener.
     """
+    worker = asyncio.create_task(tts_worker())
+    reaper = asyncio.create_task(tts_pool_reaper())
     try:
         await listen()
     except asyncio.CancelledError:
         logging.info("Main task cancelled. Exiting gracefully.")
     finally:
+        worker.cancel()
+        reaper.cancel()
+        await save_pending_speakers()
+        await close_tts_pool()
         pygame.quit()
 
 
 if __name__ == "__main__":
+    run = uvloop.run if uvloop is not None else asyncio.run
     try:
-        asyncio.run(main())
+        run(main())
     except KeyboardInterrupt:
         logging.info("Script interrupted by user. Exiting.")
\ No newline at end of file